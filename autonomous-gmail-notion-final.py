@@ -9,27 +9,194 @@ import os
 import sys
 import time
 import json
+import re
+import sqlite3
+import threading
 import schedule
 import requests
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, List, Optional
 
 # Google API Libraries
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.http import build_http
 
 # --- CONFIGURATION (Load from environment variables) ---
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 DATABASE_ID = os.getenv("DATABASE_ID")
 
+# Local record of already-synced Gmail message IDs (point at a mounted volume to survive redeploys)
+SYNC_CACHE_PATH = os.getenv("SYNC_CACHE_PATH", "sync_cache.db")
+
 # Scopes for Gmail API
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
 # Search query to find job application, rejection, and interview emails
 GMAIL_SEARCH_QUERY = 'subject:(application OR "thank you for applying" OR "received your application" OR "applying to" OR "unfortunate" OR "rejected" OR "moving forward" OR "interview" OR "interviews" OR "next steps" OR "submission" OR "applied" OR "interest" OR "registration" OR "acknowledgment" OR "receipt") -subject:("Security code" OR "Verification code" OR "Your code" OR "one-time password" OR "OTP")'
 
+# Status detection keywords, matched as substrings of the lowercased subject and snippet
+REJECTION_KEYWORDS = ["unfortunate", "not moving forward", "rejected", "another candidate", "position filled", "not be moving", "thank you for your interest but"]
+INTERVIEW_KEYWORDS = ["interview", "interviews", "meet with", "next steps", "chat with", "scheduling", "availability"]
+
+# Each keyword list compiled into one alternation so a string is scanned once per list
+REJECTION_RE = re.compile("|".join(map(re.escape, REJECTION_KEYWORDS)))
+INTERVIEW_RE = re.compile("|".join(map(re.escape, INTERVIEW_KEYWORDS)))
+
+# Company is whatever follows the last " at " in the subject, else the last " to ",
+# else the last " in " (alternatives are tried in order, each greedy from the right)
+SUBJECT_COMPANY_RE = re.compile(r"^(?:.* at |.* to |.* in )(.*)", re.S)
+SENDER_DOMAIN_RE = re.compile(r"<[^<>]*@([^<>@]+)>")
+
+# Sender domains that say nothing about the company (mail providers and ATS platforms)
+GENERIC_DOMAINS = frozenset({"gmail.com", "outlook.com", "yahoo.com", "icloud.com", "me.com", "mail.com", "notifications.greenhouse.io", "ashbyhq.com", "lever.co"})
+
+# Gmail batch requests accept up to 100 calls, but Google recommends 50 or fewer
+# to stay under the per-user quota (messages.get costs 5 units each)
+GMAIL_BATCH_SIZE = 50
+
+# Only these headers (plus the snippet) are used when parsing a message
+METADATA_HEADERS = ['Subject', 'From', 'Date']
+
+# Messages a batch did not return are fetched individually in parallel; 5 workers
+# keep messages.get (5 quota units each) near Gmail's 250 units/sec per-user limit,
+# and num_retries backs off exponentially on 429/5xx responses
+GMAIL_MAX_WORKERS = 5
+GMAIL_NUM_RETRIES = 5
+
+# Notion allows an average of 3 requests per second per integration; a few
+# workers overlap request latency while a shared token bucket keeps the overall pace
+NOTION_MAX_WORKERS = 3
+NOTION_RATE_LIMIT = 3.0
+NOTION_BURST = 3
+NOTION_MAX_RETRIES = 5
+
+# Subjects looked up per `or`-filtered query (Notion caps a compound filter at 100 conditions)
+NOTION_FILTER_CHUNK = 100
+
+@dataclass(slots=True)
+class Job:
+    """One parsed job email (slots keep per-email memory low during the mega sync)"""
+    msg_id: str
+    title: str
+    company: str
+    email_from: str
+    subject: str
+    date_received: str
+    email_preview: str
+    email_link: str
+    status: str
+    next_action: str
+    action_date: str
+
+def parse_message(message: Dict, user_email: str, now_iso: str, action_date: str) -> Optional[Job]:
+    """Extract job details from a Gmail message resource (pure function, no API calls)"""
+    msg_id = message.get('id')
+    try:
+        headers = message.get('payload', {}).get('headers', [])
+        # Reversed so the first occurrence of a repeated header wins, as before
+        hmap = {h['name'].lower(): h['value'] for h in reversed(headers)}
+        subject = hmap.get('subject', "No Subject")
+        sender = hmap.get('from', "Unknown Sender")
+        date_raw = hmap.get('date')
+        
+        # Basic parsing of company and title from subject
+        company = "Unknown Company"
+        title = subject
+
+        # Smart parsing logic
+        subject_match = SUBJECT_COMPANY_RE.match(subject)
+        if subject_match:
+            company = subject_match.group(1).strip()
+        elif " - " in sender:
+            company = sender.split(" - ")[-1].strip()
+        elif "<" in sender:
+            # Try to extract company from sender email domain, skipping generic domains
+            domain_match = SENDER_DOMAIN_RE.search(sender)
+            email_domain = domain_match.group(1).lower() if domain_match else ""
+            if email_domain not in GENERIC_DOMAINS and "." in email_domain:
+                company = email_domain.split(".")[0].capitalize()
+            else:
+                company = "Referral/Direct"
+        
+        # Clean up company name (remove punctuation at end)
+        company = company.rstrip("!.,")
+
+        # Date formatting for Notion (RFC 2822 "Date" header, trailing "(UTC)" comments allowed)
+        try:
+            received_date = parsedate_to_datetime(date_raw).isoformat() if date_raw else now_iso
+        except (TypeError, ValueError):
+            received_date = now_iso
+
+        snippet = message.get('snippet', '').lower()
+        # Use the specific user email in the link to ensure it opens in the correct account
+        link = f"https://mail.google.com/mail/u/{user_email}/#inbox/{msg_id}"
+
+        # Advanced Status Detection
+        status = "Applied"
+        next_action = "Check status"
+        subj_lc = subject.lower()
+        
+        # Rejection detection
+        if REJECTION_RE.search(subj_lc) or REJECTION_RE.search(snippet):
+            status = "Rejected"
+            next_action = "Archived"
+        
+        # Interview discovery
+        if status != "Rejected" and (INTERVIEW_RE.search(subj_lc) or INTERVIEW_RE.search(snippet)):
+            status = "Interview Round 1"
+            next_action = "Schedule/Prepare for interview"
+
+        return Job(
+            msg_id=msg_id,
+            title=title,
+            company=company,
+            email_from=sender,
+            subject=subject,
+            date_received=received_date,
+            email_preview=snippet,
+            email_link=link,
+            status=status,
+            next_action=next_action,
+            action_date=action_date
+        )
+
+    except Exception as e:
+        print(f"Error parsing message {msg_id}: {e}")
+        return None
+
+class TokenBucket:
+    """Thread-safe token bucket refilling `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self):
+        """Take one token, sleeping only if none is available"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # Going negative reserves a future token, so waiters sleep outside the lock in order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
 class JobSyncAutomation:
     def __init__(self):
         self.notion_headers = {
@@ -37,6 +204,21 @@ class JobSyncAutomation:
             "Content-Type": "application/json",
             "Notion-Version": "2025-09-03"
         }
+        # One keep-alive session for all Notion calls, sized for the sync workers
+        self.notion_session = requests.Session()
+        self.notion_session.headers.update(self.notion_headers)
+        self.notion_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=NOTION_MAX_WORKERS))
+        self.notion_bucket = TokenBucket(rate=NOTION_RATE_LIMIT, burst=NOTION_BURST)
+        self._gmail_local = threading.local()
+        # Long-lived so each worker thread keeps its keep-alive connection to Gmail across batches
+        self._gmail_pool = ThreadPoolExecutor(max_workers=GMAIL_MAX_WORKERS)
+        self._cycle_now_iso = None
+        self._cycle_action_date = None
+        self.db = sqlite3.connect(SYNC_CACHE_PATH)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS synced "
+            "(msg_id TEXT PRIMARY KEY, subject TEXT, status TEXT, page_id TEXT, last_seen TEXT)"
+        )
         self.creds = self.get_gmail_creds()
         self.gmail_service = build('gmail', 'v1', credentials=self.creds)
         
@@ -47,15 +229,16 @@ class JobSyncAutomation:
         
         self._initialize_notion_source()
         self._discover_data_source()
+        self._load_existing_pages()
 
     def _discover_data_source(self):
         """Fetch database to get the writable data_source_id for multi-source databases"""
         self.data_source_id = None
         try:
             url = f"https://api.notion.com/v1/databases/{DATABASE_ID}"
-            res = requests.get(url, headers=self.notion_headers, timeout=10)
+            res = self.notion_session.get(url, timeout=10)
             if res.status_code == 200:
-                data = res.json()
+                data = orjson.loads(res.content)
                 data_sources = data.get("data_sources", [])
                 if data_sources:
                     self.data_source_id = data_sources[0].get("id")
@@ -69,7 +252,7 @@ class JobSyncAutomation:
         """Verify the Notion database is accessible"""
         try:
             url = f"https://api.notion.com/v1/databases/{DATABASE_ID}"
-            res = requests.get(url, headers=self.notion_headers, timeout=10)
+            res = self.notion_session.get(url, timeout=10)
             if res.status_code == 200:
                 print(f"✅ Notion database connected.")
             else:
@@ -78,6 +261,72 @@ class JobSyncAutomation:
         except Exception as e:
             print(f"⚠️ Notion connectivity check exception: {str(e)}")
 
+    def _query_url(self) -> str:
+        """Query endpoint for the writable data source (or the database itself)"""
+        if self.data_source_id:
+            return f"https://api.notion.com/v1/data_sources/{self.data_source_id}/query"
+        return f"https://api.notion.com/v1/databases/{DATABASE_ID}/query"
+
+    def _query_pages(self, payload: Dict, timeout: int = 10) -> Iterator[Dict]:
+        """Yield every page matching a Notion query, following pagination cursors"""
+        payload = dict(payload, page_size=100)
+        while True:
+            res = self._notion_request("POST", self._query_url(), payload, timeout=timeout)
+            if res.status_code != 200:
+                raise RuntimeError(f"Notion Query Error ({res.status_code}): {res.text[:500]}")
+            data = orjson.loads(res.content)
+            yield from data.get('results', [])
+            if not data.get('has_more'):
+                return
+            payload["start_cursor"] = data.get('next_cursor')
+
+    def _load_existing_pages(self):
+        """Page through the Notion database once so duplicate checks become in-memory lookups"""
+        self.subject_to_page = {}
+        # Errors propagate: a partial cache would turn every missed subject into a duplicate page
+        for page in self._query_pages({}, timeout=30):
+            self._remember_page(page)
+        print(f"📚 Loaded {len(self.subject_to_page)} existing Notion entries.")
+
+    def _refresh_subjects(self, subjects: List[str]):
+        """Look up uncached subjects in bulk, catching pages added in Notion since startup"""
+        missing = [subject for subject in dict.fromkeys(subjects) if subject not in self.subject_to_page]
+        for start in range(0, len(missing), NOTION_FILTER_CHUNK):
+            chunk = missing[start:start + NOTION_FILTER_CHUNK]
+            payload = {
+                "filter": {
+                    "or": [{"property": "Subject", "rich_text": {"equals": subject}} for subject in chunk]
+                }
+            }
+            try:
+                for page in self._query_pages(payload):
+                    self._remember_page(page)
+            except Exception as e:
+                # Fall through to CREATE rather than dropping emails; may rarely cause a duplicate
+                print(f"  ❌ {str(e)}")
+
+    def _remember_page(self, page: Dict):
+        """Cache a Notion page as subject -> (page_id, status, link)"""
+        props = page.get('properties', {})
+        subject = "".join(t.get('plain_text', '') for t in props.get('Subject', {}).get('rich_text', []))
+        status = (props.get('Status', {}).get('select') or {}).get('name')
+        link = props.get('Email Link', {}).get('url') or ''
+        # Keep the first page seen for a subject, like the per-email query used to
+        self.subject_to_page.setdefault(subject, (page['id'], status, link))
+
+    def _notion_request(self, method: str, url: str, payload: Dict, timeout: int = 10) -> requests.Response:
+        """Send a rate-limited Notion request, backing off when Notion answers 429"""
+        # Serialize once with orjson; the session already sends Content-Type: application/json
+        body = orjson.dumps(payload)
+        for attempt in range(NOTION_MAX_RETRIES):
+            self.notion_bucket.consume()
+            res = self.notion_session.request(method, url, data=body, timeout=timeout)
+            if res.status_code != 429 or attempt == NOTION_MAX_RETRIES - 1:
+                break
+            # Notion says how long to wait; fall back to exponential backoff if it doesn't
+            time.sleep(float(res.headers.get("Retry-After", 2 ** attempt)))
+        return res
+
     def get_gmail_creds(self):
         """Manages Gmail OAuth2 credentials with Env Var support for Railway"""
         creds = None
@@ -95,19 +344,30 @@ class JobSyncAutomation:
         # If there are no (valid) credentials available, let the user log in.
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
+                try:
+                    creds.refresh(Request())
+                except RefreshError as e:
+                    # The browser flow below can only be finished by someone at a terminal;
+                    # on Railway (GMAIL_TOKEN / no TTY) it would wait forever, so fail loudly
+                    if env_token or not sys.stdin.isatty():
+                        raise
+                    # Refresh token revoked or expired - fall back to the browser flow below
+                    print(f"⚠️ Gmail token refresh failed ({e}), re-authorizing...")
+                    creds = None
+            if not creds or not creds.valid:
+                # Ask for offline access with forced consent so Google always returns a
+                # refresh_token; without one, every later run would need the browser again
                 # 3. Try loading Credentials from Environment Variable
                 env_creds = os.getenv("GMAIL_CREDENTIALS")
                 if env_creds:
                     print("🔑 Loading Gmail Credentials from environment variable...")
                     creds_data = json.loads(env_creds)
                     flow = InstalledAppFlow.from_client_config(creds_data, SCOPES)
-                    creds = flow.run_local_server(port=0)
+                    creds = flow.run_local_server(port=0, access_type='offline', prompt='consent')
                 # 4. Fallback to local credentials.json
                 elif os.path.exists('credentials.json'):
                     flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-                    creds = flow.run_local_server(port=0)
+                    creds = flow.run_local_server(port=0, access_type='offline', prompt='consent')
                 else:
                     print("\n❌ ERROR: No Gmail credentials found (env or file)!")
                     exit(1)
@@ -118,162 +378,117 @@ class JobSyncAutomation:
         
         return creds
 
-    def get_message_details(self, msg_id: str) -> Optional[Dict]:
-        """Extract details from a specific Gmail message"""
+    def _message_request(self, msg_id: str):
+        """Build a messages.get request returning only the headers and snippet we parse"""
+        return self.gmail_service.users().messages().get(
+            userId='me', id=msg_id, format='metadata', metadataHeaders=METADATA_HEADERS
+        )
+
+    def _gmail_http(self) -> AuthorizedHttp:
+        """Per-thread authorized HTTP object (httplib2 connections are not thread-safe)
+
+        build_http() applies the same 60s socket timeout as the service's own
+        transport, so a stalled connection can't block the fetch pool forever.
+        """
+        http = getattr(self._gmail_local, 'http', None)
+        if http is None:
+            http = self._gmail_local.http = AuthorizedHttp(self.creds, http=build_http())
+        return http
+
+    def _fetch_message(self, msg_id: str) -> Optional[Dict]:
+        """Fetch a single Gmail message (fallback when a batch request fails)"""
         try:
-            message = self.gmail_service.users().messages().get(
-                userId='me', id=msg_id, format='full'
-            ).execute()
+            return self._message_request(msg_id).execute(
+                http=self._gmail_http(), num_retries=GMAIL_NUM_RETRIES
+            )
+        except Exception as e:
+            print(f"Error fetching message {msg_id}: {e}")
+            return None
 
-            headers = message.get('payload', {}).get('headers', [])
-            subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), "No Subject")
-            sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), "Unknown Sender")
-            date_raw = next((h['value'] for h in headers if h['name'].lower() == 'date'), None)
-            
-            # Basic parsing of company and title from subject
-            company = "Unknown Company"
-            title = subject
-
-            # Smart parsing logic
-            if " at " in subject:
-                company = subject.split(" at ")[-1].strip()
-            elif " to " in subject:
-                company = subject.split(" to ")[-1].strip()
-            elif " in " in subject:
-                company = subject.split(" in ")[-1].strip()
-            elif " - " in sender:
-                company = sender.split(" - ")[-1].strip()
-            else:
-                # Try to extract company from sender email domain
-                if "<" in sender:
-                    email_domain = sender.split("<")[-1].replace(">", "").split("@")[-1].lower()
-                    # Filter out common generic domains
-                    generic_domains = ["gmail.com", "outlook.com", "yahoo.com", "icloud.com", "me.com", "mail.com", "notifications.greenhouse.io", "ashbyhq.com", "lever.co"]
-                    if email_domain not in generic_domains and "." in email_domain:
-                        company = email_domain.split(".")[0].capitalize()
-                    else:
-                        company = "Referral/Direct"
-            
-            # Clean up company name (remove punctuation at end)
-            company = company.rstrip("!.,")
-
-            # Date formatting for Notion
-            received_date = datetime.now().isoformat()
-            if date_raw:
-                # Remove timezone name in parentheses, e.g. "(UTC)"
-                clean_date = date_raw.split(' (')[0].strip()
-                for fmt in ["%a, %d %b %Y %H:%M:%S %z", "%a, %d %b %Y %H:%M:%S"]:
-                    try:
-                        parsed_date = datetime.strptime(clean_date, fmt)
-                        received_date = parsed_date.isoformat()
-                        break
-                    except ValueError:
-                        continue
+    def fetch_messages(self, msg_ids: List[str]) -> List[Dict]:
+        """Fetch up to GMAIL_BATCH_SIZE messages in a single Gmail batch request"""
+        # Listing pages can shift while a long sync runs; a repeated ID would make batch.add raise
+        msg_ids = list(dict.fromkeys(msg_ids))
+        fetched = {}
 
-            snippet = message.get('snippet', '').lower()
-            # Use the specific user email in the link to ensure it opens in the correct account
-            link = f"https://mail.google.com/mail/u/{self.user_email}/#inbox/{msg_id}"
+        def _on_msg(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
 
-            # Advanced Status Detection
-            status = "Applied"
-            next_action = "Check status"
-            
-            # Rejection detection
-            rejection_keywords = ["unfortunate", "not moving forward", "rejected", "another candidate", "position filled", "not be moving", "thank you for your interest but"]
-            if any(kw in subject.lower() or kw in snippet for kw in rejection_keywords):
-                status = "Rejected"
-                next_action = "Archived"
-            
-            # Interview discovery
-            interview_keywords = ["interview", "interviews", "meet with", "next steps", "chat with", "scheduling", "availability"]
-            if any(kw in subject.lower() or kw in snippet for kw in interview_keywords) and status != "Rejected":
-                status = "Interview Round 1"
-                next_action = "Schedule/Prepare for interview"
-
-            return {
-                "title": title,
-                "company": company,
-                "email_from": sender,
-                "subject": subject,
-                "date_received": received_date,
-                "email_preview": snippet,
-                "email_link": link,
-                "status": status,
-                "next_action": next_action,
-                "action_date": (datetime.now() + timedelta(days=7)).isoformat()
-            }
+        batch = self.gmail_service.new_batch_http_request(callback=_on_msg)
+        for msg_id in msg_ids:
+            batch.add(self._message_request(msg_id), request_id=msg_id)
 
+        try:
+            batch.execute()
         except Exception as e:
-            print(f"Error parsing message {msg_id}: {e}")
-            return None
+            print(f"  ⚠️ Gmail batch request failed, fetching individually: {e}")
 
-    def add_to_notion(self, job: Dict) -> bool:
-        """Add job to Notion or update existing entry (deduplicates by Subject)"""
+        # Retry anything the batch did not return (whole-batch or per-message errors)
+        missing = [msg_id for msg_id in msg_ids if msg_id not in fetched]
+        if missing:
+            fetched.update(zip(missing, self._gmail_pool.map(self._fetch_message, missing)))
+
+        return [fetched[msg_id] for msg_id in msg_ids if fetched[msg_id]]
+
+    def add_to_notion(self, job: Job) -> Optional[bool]:
+        """Add job to Notion or update existing entry (deduplicates by Subject)
+
+        Returns True if a page was created, False if an existing page was kept
+        or updated, and None if Notion rejected the request.
+        """
 
-        if self.data_source_id:
-            query_url = f"https://api.notion.com/v1/data_sources/{self.data_source_id}/query"
-        else:
-            query_url = f"https://api.notion.com/v1/databases/{DATABASE_ID}/query"
-            
-        query_payload = {
-            "filter": {
-                "property": "Subject",
-                "rich_text": {"equals": job['subject']}
-            }
-        }
-        
         try:
-            check_res = requests.post(query_url, headers=self.notion_headers, json=query_payload, timeout=10)
-            if check_res.status_code != 200:
-                print(f"  ❌ Notion Query Error ({check_res.status_code}): {check_res.text}")
-                # Query failed - fall through to CREATE to avoid silently dropping the email.
-                # This may rarely cause a duplicate, but is better than losing data.
-                results = []
-            else:
-                results = check_res.json().get('results', [])
+            existing = self.subject_to_page.get(job.subject)
             
             # Prepare properties
             properties = {
-                "Title": {"title": [{"text": {"content": job['title']}}]},
-                "Company": {"rich_text": [{"text": {"content": job['company']}}]},
-                "Email From": {"rich_text": [{"text": {"content": job['email_from']}}]},
-                "Subject": {"rich_text": [{"text": {"content": job['subject']}}]},
-                "Date Received": {"date": {"start": job['date_received']}},
-                "Email Preview": {"rich_text": [{"text": {"content": job['email_preview'][:2000]}}]},
-                "Email Link": {"url": job['email_link']},
-                "Status": {"select": {"name": job['status']}},
-                "Next Action": {"rich_text": [{"text": {"content": job['next_action']}}]},
-                "Action Date": {"date": {"start": job['action_date']}}
+                "Title": {"title": [{"text": {"content": job.title}}]},
+                "Company": {"rich_text": [{"text": {"content": job.company}}]},
+                "Email From": {"rich_text": [{"text": {"content": job.email_from}}]},
+                "Subject": {"rich_text": [{"text": {"content": job.subject}}]},
+                "Date Received": {"date": {"start": job.date_received}},
+                "Email Preview": {"rich_text": [{"text": {"content": job.email_preview[:2000]}}]},
+                "Email Link": {"url": job.email_link},
+                "Status": {"select": {"name": job.status}},
+                "Next Action": {"rich_text": [{"text": {"content": job.next_action}}]},
+                "Action Date": {"date": {"start": job.action_date}}
             }
 
-            if len(results) > 0:
+            if existing:
                 # UPDATE existing page
-                page_id = results[0]['id']
-                current_props = results[0].get('properties', {})
-                current_status = current_props.get('Status', {}).get('select', {}).get('name')
-                current_link = current_props.get('Email Link', {}).get('url', '')
+                page_id, current_status, current_link = existing
                 
                 # Update if status changed OR if the link is in the old "/u/0/" format
                 link_outdated = "/u/0/" in current_link and self.user_email not in current_link
                 
-                if current_status != job['status'] or link_outdated:
-                    update_url = f"https://api.notion.com/v1/pages/{page_id}"
-                    update_payload = {
-                        "properties": {
-                            "Status": {"select": {"name": job['status']}},
-                            "Next Action": {"rich_text": [{"text": {"content": job['next_action']}}]},
-                            "Email Preview": {"rich_text": [{"text": {"content": job['email_preview'][:2000]}}]},
-                            "Email Link": {"url": job['email_link']}
-                        }
+                if current_status == job.status and not link_outdated:
+                    return False
+                
+                update_url = f"https://api.notion.com/v1/pages/{page_id}"
+                update_payload = {
+                    "properties": {
+                        "Status": {"select": {"name": job.status}},
+                        "Next Action": {"rich_text": [{"text": {"content": job.next_action}}]},
+                        "Email Preview": {"rich_text": [{"text": {"content": job.email_preview[:2000]}}]},
+                        "Email Link": {"url": job.email_link}
                     }
-                    patch_res = requests.patch(update_url, headers=self.notion_headers, json=update_payload, timeout=10)
-                    if patch_res.status_code != 200:
-                        print(f"  ❌ Notion Update Error ({patch_res.status_code}): {patch_res.text}")
-                    elif link_outdated:
-                        print(f"  🔗 Fixed Link: {job['company']}")
+                }
+                patch_res = self._notion_request("PATCH", update_url, update_payload)
+                if patch_res.status_code == 404 or (patch_res.status_code == 400 and "archived" in patch_res.text):
+                    # Page was deleted/archived in Notion since it was cached - recreate it below
+                    print(f"  🗑️ Cached page gone, recreating: {job.company}")
+                    self.subject_to_page.pop(job.subject, None)
+                elif patch_res.status_code != 200:
+                    print(f"  ❌ Notion Update Error ({patch_res.status_code}): {patch_res.text}")
+                    return None
+                else:
+                    self.subject_to_page[job.subject] = (page_id, job.status, job.email_link)
+                    if link_outdated:
+                        print(f"  🔗 Fixed Link: {job.company}")
                     else:
-                        print(f"  🔄 Updated Status: {job['company']}")
-                return False
+                        print(f"  🔄 Updated Status: {job.company}")
+                    return False
 
             # CREATE new page
             url = "https://api.notion.com/v1/pages"
@@ -286,64 +501,110 @@ class JobSyncAutomation:
                 "properties": properties
             }
 
-            response = requests.post(url, headers=self.notion_headers, json=payload, timeout=10)
+            response = self._notion_request("POST", url, payload)
             if response.status_code == 200:
+                self.subject_to_page[job.subject] = (orjson.loads(response.content)['id'], job.status, job.email_link)
                 return True
             else:
                 print(f"  ❌ Notion Create Error ({response.status_code}): {response.text}")
-                return False
+                return None
             
         except Exception as e:
-            print(f"  ❌ Exception for {job['company']}: {str(e)}")
-            return False
+            print(f"  ❌ Exception for {job.company}: {str(e)}")
+            return None
+
+    def _record_synced(self, jobs: List[Job]):
+        """Remember synced message IDs so later cycles (and restarts) skip fetching them"""
+        rows = []
+        for job in jobs:
+            page = self.subject_to_page.get(job.subject)
+            if page:
+                rows.append((job.msg_id, job.subject, page[1], page[0], self._cycle_now_iso))
+        # One transaction per batch instead of a commit per email
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO synced VALUES (?, ?, ?, ?, ?)", rows)
+
+    def _iter_message_ids(self, count: int) -> Iterator[str]:
+        """Yield up to `count` matching message IDs (newest first), one list page at a time"""
+        fetched = 0
+        next_page_token = None
+        while fetched < count:
+            results = self.gmail_service.users().messages().list(
+                userId='me', 
+                q=GMAIL_SEARCH_QUERY, 
+                maxResults=min(count - fetched, 500),
+                pageToken=next_page_token
+            ).execute()
+            
+            batch = results.get('messages', [])
+            if not batch:
+                return
+            
+            for msg in batch:
+                yield msg['id']
+            fetched += len(batch)
+            next_page_token = results.get('nextPageToken')
+            if not next_page_token:
+                return
 
     def sync_one_by_one(self, count=2000):
-        """Fetch and sync emails one by one to save memory and handle large batches"""
-        print(f"\n⏱️  Sync started: {datetime.now().strftime('%H:%M:%S')}")
+        """Fetch and sync emails batch by batch to save memory and handle large backlogs"""
+        # Timestamps are computed once per cycle; a few minutes of drift doesn't matter here
+        now = datetime.now()
+        self._cycle_now_iso = now.isoformat()
+        self._cycle_action_date = (now + timedelta(days=7)).isoformat()
+        print(f"\n⏱️  Sync started: {now.strftime('%H:%M:%S')}")
         
         try:
-            messages = []
-            next_page_token = None
-            
             print(f"🔍 Searching Gmail for up to {count} matching emails...")
             
-            while len(messages) < count:
-                max_results = min(count - len(messages), 500)
-                results = self.gmail_service.users().messages().list(
-                    userId='me', 
-                    q=GMAIL_SEARCH_QUERY, 
-                    maxResults=max_results,
-                    pageToken=next_page_token
-                ).execute()
-                
-                batch = results.get('messages', [])
-                if not batch:
-                    break
-                    
-                messages.extend(batch)
-                next_page_token = results.get('nextPageToken')
-                if not next_page_token:
-                    break
-
-            print(f"📝 Found {len(messages)} potential emails. Starting one-by-one sync...")
+            # Message IDs stream in page by page; already-synced ones never reach messages.get
+            known = {row[0] for row in self.db.execute("SELECT msg_id FROM synced")}
+            new_ids = (msg_id for msg_id in self._iter_message_ids(count) if msg_id not in known)
             
+            processed = 0
             added_count = 0
-            for i, msg in enumerate(messages):
-                if i % 25 == 0 and i > 0:
-                    print(f"  ...processed {i}/{len(messages)} emails")
-                    sys.stdout.flush()
-                
-                # Fetch details for just ONE message
-                job = self.get_message_details(msg['id'])
-                if job:
-                    # Sync to Notion immediately
-                    if self.add_to_notion(job):
-                        print(f"✅ Synced: {job['company']} - {job['title']}")
-                        added_count += 1
-                    time.sleep(0.5)  # Rate limit every processed email, not just new ones
-
-                # The 'job' variable is overwritten in next iteration, allowing GC
+            cycle_subjects = set()
+            with ThreadPoolExecutor(max_workers=NOTION_MAX_WORKERS) as notion_pool:
+                while True:
+                    msg_ids = list(islice(new_ids, GMAIL_BATCH_SIZE))
+                    if not msg_ids:
+                        break
+                    if processed > 0:
+                        print(f"  ...processed {processed} new emails")
+                        sys.stdout.flush()
+                    processed += len(msg_ids)
+                    
+                    # Fetch details for one batch of messages in a single HTTP round trip
+                    jobs = []
+                    for message in self.fetch_messages(msg_ids):
+                        job = parse_message(message, self.user_email, self._cycle_now_iso, self._cycle_action_date)
+                        if job:
+                            jobs.append(job)
+                    self._refresh_subjects([job.subject for job in jobs])
+                    
+                    pending = []
+                    synced = []
+                    for job in jobs:
+                        # Gmail lists newest first, so the newest email decides each subject's status
+                        if job.subject in cycle_subjects:
+                            synced.append(job)
+                        else:
+                            cycle_subjects.add(job.subject)
+                            pending.append((job, notion_pool.submit(self.add_to_notion, job)))
+                    
+                    # Sync the batch to Notion concurrently before fetching the next one
+                    for job, future in pending:
+                        added = future.result()
+                        if added is None:
+                            continue  # Not recorded, so the next cycle retries it
+                        if added:
+                            print(f"✅ Synced: {job.company} - {job.title}")
+                            added_count += 1
+                        synced.append(job)
+                    self._record_synced(synced)
             
+            print(f"📝 Checked {processed} new emails.")
             if added_count == 0:
                 print("  (No new job emails found)")
             else:
@@ -377,9 +638,14 @@ def main():
         print("  - Syncing new unique emails to Notion")
         print("  - Running historical recovery + 2min live checks\n")
 
+        # Sleep exactly until the next scheduled sync instead of polling
         while True:
+            idle = schedule.idle_seconds()
+            if idle is None:
+                break
+            if idle > 0:
+                time.sleep(idle)
             schedule.run_pending()
-            time.sleep(30)
             
     except KeyboardInterrupt:
         print("\n👋 Automation stopped by user.")